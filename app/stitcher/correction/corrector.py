@@ -1,9 +1,17 @@
 """
 Distortion corrector module for providing functionality to correct a distorted image.
 """
+from __future__ import division
+from functools import lru_cache
 import numpy as np
 import cv2
 
+# Calibration parameters used by correct_distortion and get_correction_maps.
+CAMERA_MATRIX = np.array([[857.48296979,
+                           0, 968.06224829],
+                          [0, 876.71824265, 556.37145899], [0, 0, 1]])
+DISTORTION_COEFFICIENTS = np.array([-2.57614020e-01, 8.77086999e-02, 0, 0, 0])
+
 def correct_distortion(image):
     """
     This function corrects the distortion of a radially-distorted
@@ -28,12 +36,28 @@ def correct_distortion(image):
     #                           [0, 6.03873075e+02, 8.71465543e+02], [0, 0, 1]])
     # distortion_coefficients = np.array([-0.13851498, 0.01500291, 0, 0, 0])
 
-    camera_matrix = np.array([[857.48296979,
-                               0, 968.06224829],
-                              [0, 876.71824265, 556.37145899], [0, 0, 1]])
-    distortion_coefficients = np.array([-2.57614020e-01, 8.77086999e-02, 0, 0, 0])
-
-    # Correct the radial distortion
-    corrected_image = cv2.undistort(image, camera_matrix, distortion_coefficients)
+    # Correct the radial distortion with remap tables cached for the image size.
+    (height, width) = image.shape[:2]
+    (map1, map2) = get_correction_maps((width, height))
+    corrected_image = cv2.remap(image, map1, map2, cv2.INTER_LINEAR)
 
     return corrected_image
+
+@lru_cache(maxsize=8)
+def get_correction_maps(size, dsize=None):
+    """
+    Returns the (map1, map2) lookup tables for cv2.remap that correct the distortion of an
+    image of the provided (width, height) size and scale the result to dsize in the same pass.
+    The maps only depend on the sizes, so they are cached and shared between callers.
+    They are returned in the fixed-point CV_16SC2 format, which cv2.remap samples fastest.
+    """
+    if dsize is None:
+        dsize = size
+
+    # Scaling the output camera matrix folds the resize into the undistortion mapping.
+    new_camera_matrix = CAMERA_MATRIX.copy()
+    new_camera_matrix[0] *= dsize[0] / size[0]
+    new_camera_matrix[1] *= dsize[1] / size[1]
+
+    return cv2.initUndistortRectifyMap(CAMERA_MATRIX, DISTORTION_COEFFICIENTS, None,
+                                       new_camera_matrix, dsize, cv2.CV_16SC2)
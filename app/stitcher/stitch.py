@@ -82,14 +82,14 @@ def get_single_handler(width, height, index):
     """
     Returns a handler for single stream
     """
-    return MultiFeedHandler([CameraFeed(index, width, height)])
+    return MultiFeedHandler([CameraFeed(index, width, height).start()])
 
 def get_multi_handler(width, height, left_index, right_index):
     """
     Returns a handler for multiple streams
     """
-    left_feed = CameraFeed(left_index, width, height)
-    right_feed = CameraFeed(right_index, width, height)
+    left_feed = CameraFeed(left_index, width, height).start()
+    right_feed = CameraFeed(right_index, width, height).start()
     return MultiFeedHandler([left_feed, right_feed])
 
 def parse_args():
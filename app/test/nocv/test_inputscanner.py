@@ -3,7 +3,6 @@ Module responsible for testing functionality of the inputscanner utility.
 """
 
 from __future__ import absolute_import, division, print_function
-from app.util.inputscanner import InputScanner
 
 def test_read_int():
     """ Checks to make sure output of read_int is the same as input. """
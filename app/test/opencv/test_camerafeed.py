@@ -0,0 +1,62 @@
+"""
+Module responsible for testing the threaded reader of CameraFeed without a camera.
+"""
+
+from __future__ import absolute_import, division, print_function
+import threading
+import numpy as np
+import cv2
+from app.util.feed import CameraFeed
+
+class StubCapture(object):
+    """ Capture that delivers the given frames, each once its release event is set. """
+    def __init__(self, frames, events):
+        self.frames = list(frames)
+        self.events = list(events)
+
+    def set(self, prop, value): # pylint: disable=unused-argument
+        """ Accepts every property, like a capture device that honors all requests. """
+        return True
+
+    def read(self, image=None): # pylint: disable=unused-argument
+        """ Returns the next frame once its event is set, or no frame when none are left. """
+        if not self.frames:
+            return (False, None)
+        self.events.pop(0).wait(timeout=5)
+        return (True, self.frames.pop(0))
+
+    def release(self):
+        """ Drops the remaining frames. """
+        self.frames = []
+
+def stub_feed(monkeypatch, frames, events):
+    """ Returns a started CameraFeed reading from a StubCapture. """
+    monkeypatch.setattr(cv2, "VideoCapture", lambda index: StubCapture(frames, events))
+    return CameraFeed(0).start()
+
+def test_has_next_holds_frame_for_get_next(monkeypatch):
+    """ Checks that a frame read by the reader thread is returned after has_next(). """
+    frame = np.full((4, 4, 3), 7, np.uint8)
+    (first, last) = (threading.Event(), threading.Event())
+    first.set()
+    feed = stub_feed(monkeypatch, [frame, frame], [first, last])
+    assert feed.has_next()
+    assert feed.get_next(False, False) is frame
+    last.set()
+    feed.close()
+
+def test_has_next_is_false_after_reader_stops(monkeypatch):
+    """ Checks that an exhausted feed never reports a next frame or hands out None early. """
+    events = [threading.Event() for _ in range(3)]
+    for event in events:
+        event.set()
+    feed = stub_feed(monkeypatch, [np.zeros((4, 4, 3), np.uint8)] * 3, events)
+    frames = []
+    for _ in range(5):
+        if not feed.has_next():
+            break
+        frames.append(feed.get_next(False, False))
+    assert not feed.has_next()
+    assert all(frame is not None for frame in frames)
+    assert feed.get_next(False, False) is None
+    feed.close()
@@ -0,0 +1,119 @@
+"""
+Module responsible for testing functionality of the capture utility.
+"""
+
+from __future__ import absolute_import, division, print_function
+import queue
+import numpy as np
+import cv2
+import pytest
+from app.util import capture
+from app.util.capture import (write_queued_frames, start_writer_thread, queue_frame,
+                              create_video_writer, has_huffman_tables, capture_camera_frames)
+
+class ListWriter(object): # pylint: disable=too-few-public-methods
+    """ Writer that records written frames and can fail after a number of frames. """
+    def __init__(self, fail_after=None):
+        self.frames = []
+        self.fail_after = fail_after
+
+    def write(self, frame):
+        """ Records frame, raising BrokenPipeError once fail_after frames were written. """
+        if self.fail_after is not None and len(self.frames) >= self.fail_after:
+            raise BrokenPipeError("encoder exited")
+        self.frames.append(frame)
+
+def test_write_queued_frames_stops_at_sentinel():
+    """ Checks that frames are written in order and writing stops at None. """
+    writer = ListWriter()
+    frame_queue = queue.Queue()
+    for frame in (1, 2, 3, None, 4):
+        frame_queue.put(frame)
+    errors = []
+    write_queued_frames(writer, frame_queue, errors)
+    assert writer.frames == [1, 2, 3]
+    assert errors == []
+    assert frame_queue.get_nowait() == 4
+
+def test_write_queued_frames_stores_writer_error():
+    """ Checks that a failing writer stops the loop and its exception is kept. """
+    writer = ListWriter(fail_after=1)
+    frame_queue = queue.Queue()
+    for frame in (1, 2, 3, None):
+        frame_queue.put(frame)
+    errors = []
+    write_queued_frames(writer, frame_queue, errors)
+    assert writer.frames == [1]
+    assert len(errors) == 1
+    assert isinstance(errors[0], BrokenPipeError)
+
+def test_queue_frame_returns_false_after_writer_failure():
+    """ Checks that producers are not blocked once the writer thread has died. """
+    errors = []
+    (frame_queue, writer_thread) = start_writer_thread(ListWriter(fail_after=0), errors,
+                                                       max_queued_frames=1)
+    assert queue_frame(frame_queue, writer_thread, 1)
+    writer_thread.join(timeout=5)
+    assert not writer_thread.is_alive()
+    assert not queue_frame(frame_queue, writer_thread, 2)
+    assert not queue_frame(frame_queue, writer_thread, None)
+    assert len(errors) == 1
+
+def test_create_video_writer_falls_back_without_ffmpeg(tmp_path, monkeypatch):
+    """ Checks that an OpenCV writer is returned when ffmpeg is not on the PATH. """
+    monkeypatch.setenv("PATH", str(tmp_path))
+    writer = create_video_writer(str(tmp_path / "out.mp4"), 30, (64, 48), "libx264")
+    assert isinstance(writer, cv2.VideoWriter)
+    writer.release()
+
+def strip_huffman_tables(jpeg_bytes):
+    """ Returns jpeg_bytes without its DHT segments, as sent by many MJPG cameras. """
+    stripped = bytearray(jpeg_bytes[:2])
+    position = 2
+    while jpeg_bytes[position + 1] != 0xDA:
+        segment_end = position + 2 + ((jpeg_bytes[position + 2] << 8) | jpeg_bytes[position + 3])
+        if jpeg_bytes[position + 1] != 0xC4:
+            stripped += jpeg_bytes[position:segment_end]
+        position = segment_end
+    return bytes(stripped + jpeg_bytes[position:])
+
+def test_has_huffman_tables():
+    """ Checks detection of DHT segments in encoded JPEG frames. """
+    jpeg = cv2.imencode(".jpg", np.zeros((16, 16, 3), np.uint8))[1]
+    assert has_huffman_tables(jpeg)
+    stripped = np.frombuffer(strip_huffman_tables(jpeg.tobytes()), np.uint8)
+    assert not has_huffman_tables(stripped)
+
+class FailingFeed(object):
+    """ CameraFeed stand-in whose ramp fails for the given index. """
+    closed = []
+
+    def __init__(self, feed_index, fail_index=1):
+        self.feed_index = feed_index
+        self.fail_index = fail_index
+
+    def enable_raw_jpeg(self):
+        """ Reports that raw JPEG retrieval is unsupported. """
+        return False
+
+    def ramp(self):
+        """ Raises for the failing index. """
+        if self.feed_index == self.fail_index:
+            raise RuntimeError("camera disconnected")
+
+    def close(self):
+        """ Records that the feed was closed. """
+        FailingFeed.closed.append(self.feed_index)
+
+def test_capture_camera_frames_without_indices(tmp_path):
+    """ Checks that no feeds are opened and no frames saved when no index is provided. """
+    capture_camera_frames(str(tmp_path), "jpg")
+    assert list(tmp_path.iterdir()) == []
+
+def test_capture_camera_frames_closes_feeds_on_error(tmp_path, monkeypatch):
+    """ Checks that every feed is closed when ramping one of them fails. """
+    monkeypatch.setattr(capture, "CameraFeed", FailingFeed)
+    FailingFeed.closed = []
+    with pytest.raises(RuntimeError):
+        capture_camera_frames(str(tmp_path), "jpg", 0, 1, 2)
+    assert sorted(FailingFeed.closed) == [0, 1, 2]
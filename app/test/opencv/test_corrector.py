@@ -0,0 +1,26 @@
+"""
+Module responsible for testing functionality of the distortion corrector.
+"""
+
+from __future__ import absolute_import, division, print_function
+import numpy as np
+import cv2
+from app.stitcher.correction.corrector import (correct_distortion, get_correction_maps,
+                                               CAMERA_MATRIX, DISTORTION_COEFFICIENTS)
+
+def test_correct_distortion_matches_undistort():
+    """ Checks that remapping with cached maps matches cv2.undistort. """
+    image = np.random.RandomState(0).randint(0, 256, (540, 960, 3)).astype(np.uint8)
+    expected = cv2.undistort(image, CAMERA_MATRIX, DISTORTION_COEFFICIENTS)
+    assert np.array_equal(correct_distortion(image), expected)
+
+def test_correction_maps_have_output_size():
+    """ Checks that correction maps are sized to the requested output. """
+    (map1, map2) = get_correction_maps((1920, 1080), (640, 360))
+    assert map1.shape[:2] == (360, 640)
+    assert map2.shape[:2] == (360, 640)
+
+def test_correction_maps_default_to_source_size():
+    """ Checks that correction maps keep the source size when no output size is given. """
+    (map1, _) = get_correction_maps((960, 540))
+    assert map1.shape[:2] == (540, 960)
@@ -8,10 +8,7 @@ import pytest
 from app.util.feed import CameraFeed
 
 
-opencv = pytest.mark.skipif(
-    not pytest.config.getoption("--opencv"),
-    reason="Need --opencv option to run."
-)
+opencv = pytest.mark.opencv
 
 @opencv
 def test_frame_resize():
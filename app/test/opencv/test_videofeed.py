@@ -0,0 +1,62 @@
+"""
+Module responsible for testing frame processing of the VideoFeed on a synthetic video file.
+"""
+
+from __future__ import absolute_import, division, print_function
+import numpy as np
+import cv2
+import pytest
+from app.util.feed import VideoFeed
+from app.stitcher.correction.corrector import correct_distortion
+
+@pytest.fixture
+def video_path(tmp_path):
+    """ Writes a short synthetic 1280x720 video and returns its path. """
+    path = str(tmp_path / "synthetic.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (1280, 720))
+    for index in range(10):
+        writer.write(np.full((720, 1280, 3), index * 20, np.uint8))
+    writer.release()
+    return path
+
+def test_resize_rounds_height():
+    """ Checks that the resized height is rounded to the nearest pixel. """
+    feed = VideoFeed("missing.avi", width=300)
+    # 479 * 300 / 640 = 224.53
+    assert feed.resize(np.zeros((479, 640, 3), np.uint8)).shape == (225, 300, 3)
+
+def test_resize_picks_interpolation():
+    """ Checks that downscaling uses INTER_AREA, upscaling INTER_LINEAR and no resize neither. """
+    frame = np.random.RandomState(0).randint(0, 256, (480, 640, 3)).astype(np.uint8)
+    for (width, interpolation) in ((256, cv2.INTER_AREA), (1280, cv2.INTER_LINEAR)):
+        feed = VideoFeed("missing.avi", width=width)
+        expected = cv2.resize(frame, (width, width * 3 // 4), interpolation=interpolation)
+        assert np.array_equal(feed.resize(frame), expected)
+    assert VideoFeed("missing.avi", width=640).resize(frame) is frame
+
+def test_get_next_flag_combinations(video_path):
+    """ Checks the size of frames returned for each resize and correct combination. """
+    feed = VideoFeed(video_path)
+    assert feed.get_next().shape == (360, 640, 3)
+    assert feed.get_next(True, False).shape == (360, 640, 3)
+    assert feed.get_next(False, True).shape == (720, 1280, 3)
+    assert feed.get_next(False, False).shape == (720, 1280, 3)
+    feed.close()
+
+def test_get_next_corrects_like_corrector(video_path):
+    """ Checks that a corrected, unresized frame matches correct_distortion on the raw frame. """
+    raw_feed = VideoFeed(video_path)
+    raw_frame = raw_feed.get_next(False, False).copy()
+    raw_feed.close()
+    feed = VideoFeed(video_path)
+    assert np.array_equal(feed.get_next(False, True), correct_distortion(raw_frame))
+    feed.close()
+
+def test_get_next_reuses_buffers(video_path):
+    """ Checks that consecutive frames are written into the same buffer. """
+    feed = VideoFeed(video_path)
+    for flags in ((True, True), (True, False), (False, True), (False, False)):
+        first = feed.get_next(*flags)
+        second = feed.get_next(*flags)
+        assert first is second
+    feed.close()
@@ -6,9 +6,14 @@ import argparse
 import datetime
 import time
 import os
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import cv2
 from .textformatter import TextFormatter
 from .feed import CameraFeed
+from .ffmpegwriter import FFmpegWriter
 
 
 def main():
@@ -19,6 +24,7 @@ def main():
     capture_type = parsed_args.capture_type
     num_cameras = parsed_args.num_cameras
     camera_index = parsed_args.camera_index
+    encoder = parsed_args.encoder
 
     if capture_type == "frame":
         if num_cameras == 1:
@@ -30,9 +36,9 @@ def main():
     elif capture_type == "video":
         if num_cameras == 1:
             if camera_index is not 0:
-                capture_single_video(camera_index, 5)
+                capture_single_video(camera_index, 5, encoder=encoder)
             else:
-                capture_single_video(camera_index, 5, 12)
+                capture_single_video(camera_index, 5, 12, encoder=encoder)
         elif num_cameras == 2:
             capture_camera_videos(5, 30, "out/captured_videos",
                                   "avi", 0, 1)
@@ -42,35 +48,108 @@ def main():
         TextFormatter.print_error("Please provide a proper capture argument.")
 
 def capture_single_video(index=0, duration=5, fps=30, output_dir="out/captured_videos",
-                         filetype="mp4"):
+                         filetype="mp4", *, encoder="libx264"):
     """
     Ramps up camera provided by index and captures video for provided capture_duration (in sec).
+    Frames are encoded by ffmpeg with the provided encoder, e.g. h264_nvenc for NVIDIA GPUs,
+    falling back to OpenCV's writer if ffmpeg is not available.
     """
-    camera_feed = CameraFeed(index)
-    camera_feed.ramp(fps)
-    filepath = create_filepath(output_dir, filetype)
-
+    camera_feed = CameraFeed(index, fps=fps)
     writer = None
+    frame_queue = None
+    writer_thread = None
+    writer_errors = []
+
+    try:
+        camera_feed.ramp(fps)
+        filepath = create_filepath(output_dir, filetype)
+
+        end_time = time.monotonic() + duration
+        while time.monotonic() < end_time:
+            frame = camera_feed.get_next(False, False)
+            if writer is None:
+                (height, width) = frame.shape[:2]
+                writer = create_video_writer(filepath, fps, (width, height), encoder)
+                (frame_queue, writer_thread) = start_writer_thread(writer, writer_errors)
+            # get_next reuses its frame buffer, so the queued frame must be a copy.
+            if not queue_frame(frame_queue, writer_thread, frame.copy()):
+                break
+    finally:
+        try:
+            if writer is not None:
+                queue_frame(frame_queue, writer_thread, None)
+                writer_thread.join()
+                writer.release()
+        finally:
+            camera_feed.close()
 
-    start_time = time.time()
-    while time.time() < start_time + duration:
-        frame = camera_feed.get_next(True, False)
-        if writer is None:
-            (height, width) = frame.shape[:2]
-            writer = cv2.VideoWriter(filepath, cv2.VideoWriter_fourcc(*"MP4V"),
-                                     fps, (width, height))
-        writer.write(frame)
+    if writer_errors:
+        TextFormatter.print_error("Video could not be written: %s" % writer_errors[0])
+    else:
+        TextFormatter.print_info("Video was captured for %s seconds." % duration)
 
-    writer.release()
-    camera_feed.close()
+def create_video_writer(filepath, fps, frame_size, encoder):
+    """
+    Returns an FFmpegWriter using the provided encoder, or an OpenCV MP4V writer
+    if ffmpeg cannot be started.
+    """
+    try:
+        return FFmpegWriter(filepath, fps, frame_size, encoder)
+    except OSError as error:
+        TextFormatter.print_error("Could not start ffmpeg (%s), using OpenCV writer." % error)
+        return cv2.VideoWriter(filepath, cv2.VideoWriter_fourcc(*"MP4V"), fps, frame_size)
 
-    TextFormatter.print_info("Video was captured for %s seconds." % duration)
+def start_writer_thread(writer, errors, max_queued_frames=64):
+    """
+    Starts a daemon thread that writes queued frames to the provided writer, so disk I/O
+    does not stall the capture loop. Returns the frame queue and the thread.
+    Putting None on the queue stops the thread once the queued frames are written.
+    An exception raised by the writer stops the thread and is appended to errors.
+    """
+    frame_queue = queue.Queue(maxsize=max_queued_frames)
+    writer_thread = threading.Thread(target=write_queued_frames,
+                                     args=(writer, frame_queue, errors))
+    writer_thread.daemon = True
+    writer_thread.start()
+    return (frame_queue, writer_thread)
+
+def write_queued_frames(writer, frame_queue, errors):
+    """
+    Writes frames from frame_queue to writer until None is received.
+    If writing fails, the exception is appended to errors and writing stops.
+    """
+    while True:
+        frame = frame_queue.get()
+        if frame is None:
+            break
+        try:
+            writer.write(frame)
+        except Exception as error: # pylint: disable=broad-except
+            errors.append(error)
+            break
+
+def queue_frame(frame_queue, writer_thread, frame, timeout=0.1):
+    """
+    Puts frame on the queue drained by writer_thread, waiting while the queue is full.
+    Returns False without queueing if the writer thread has stopped.
+    """
+    while writer_thread.is_alive():
+        try:
+            frame_queue.put(frame, timeout=timeout)
+            return True
+        except queue.Full:
+            pass
+    return False
 
 def capture_camera_frames(output_dir="out/captured_frames", filetype="jpg", *feed_indices):
     """
     Ramps up cameras provided by index and captures a single frame from each for testing.
     """
 
+    if not feed_indices:
+        TextFormatter.print_error("Please provide at least one camera index.")
+        return
+
     # Creates CameraFeeds for the provided indices and adds them to a list.
     camera_feed_list = []
     frame_list = []
@@ -79,25 +158,104 @@ def capture_camera_frames(output_dir="out/captured_frames", filetype="jpg", *fee
         camera_feed = CameraFeed(feed_index)
         camera_feed_list.append(camera_feed)
 
-    # Ramps up the available cameras.
-    for camera_feed in camera_feed_list:
-        TextFormatter.print_info("Camera feed ramped and read.")
-        camera_feed.ramp()
-        if camera_feed.has_next():
-            frame = camera_feed.get_next(True, False)
-        camera_feed.close()
-        frame_list.append(frame)
+    try:
+        # JPEG frames are saved as delivered by cameras that support it, skipping decode and
+        # encode.
+        save_jpeg = filetype in ("jpg", "jpeg")
+        raw_jpeg_list = [save_jpeg and camera_feed.enable_raw_jpeg()
+                         for camera_feed in camera_feed_list]
+
+        with ThreadPoolExecutor(len(camera_feed_list)) as executor:
+            # Ramps up the available cameras in parallel.
+            list(executor.map(ramp_feed, camera_feed_list))
+            TextFormatter.print_info("Camera feeds ramped.")
+
+            # Grabs on every camera at once, released by a barrier, before retrieving any
+            # frame; retrieval does the slower decoding.
+            barrier = threading.Barrier(len(camera_feed_list))
+            grab_results = list(executor.map(partial(grab_at_barrier, barrier=barrier),
+                                             camera_feed_list))
+
+        grab_times = [grab_time for (_, grab_time) in grab_results]
+        TextFormatter.print_info("Frames grabbed within %.3f ms of each other." %
+                                 ((max(grab_times) - min(grab_times)) / 1e6))
+
+        grabbed_list = [grabbed for (grabbed, _) in grab_results]
+        for camera_feed, grabbed, raw_jpeg in zip(camera_feed_list, grabbed_list,
+                                                  raw_jpeg_list):
+            if grabbed:
+                frame = camera_feed.retrieve_next()[1]
+                if raw_jpeg and not has_huffman_tables(frame):
+                    # Many decoders reject MJPG frames saved without their Huffman tables.
+                    frame = cv2.imdecode(frame, cv2.IMREAD_COLOR)
+                    raw_jpeg = False
+                if not raw_jpeg:
+                    frame = camera_feed.resize(frame)
+                frame_list.append((frame, raw_jpeg))
+                TextFormatter.print_info("Camera feed read.")
+    finally:
+        # Every feed is released, even if ramping, grabbing or retrieving failed on one.
+        for camera_feed in camera_feed_list:
+            camera_feed.close()
 
     frame_counter = 1
-    for frame in frame_list:
+    for frame, raw_jpeg in frame_list:
         TextFormatter.print_info("Filepath created.")
         filepath = create_filepath(output_dir, filetype, "%s--" % frame_counter)
         print(filepath)
-        cv2.imwrite(filepath, frame)
+        save_frame(filepath, frame, raw_jpeg)
         frame_counter += 1
 
     TextFormatter.print_info("Frames were captured and saved.")
 
+def ramp_feed(camera_feed):
+    """
+    Ramps up the provided camera feed.
+    """
+    camera_feed.ramp()
+
+def grab_at_barrier(camera_feed, barrier):
+    """
+    Waits for all cameras to reach the barrier, then grabs a frame from camera_feed.
+    Returns whether a frame was grabbed and the monotonic time of the grab in nanoseconds.
+    """
+    barrier.wait()
+    grabbed = camera_feed.has_next()
+    return (grabbed, time.monotonic_ns())
+
+def has_huffman_tables(jpeg):
+    """
+    Returns True if the encoded JPEG defines Huffman tables (a DHT segment) before its scan.
+    Cameras often omit them from MJPG frames and rely on the standard tables.
+    """
+    data = jpeg.tobytes()
+    # Walks the marker segments that follow the start-of-image marker.
+    position = 2
+    while position + 4 <= len(data) and data[position] == 0xFF:
+        marker = data[position + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker.
+            position += 1
+            continue
+        if marker == 0xC4:
+            return True
+        if marker == 0xDA:
+            return False
+        segment_length = (data[position + 2] << 8) | data[position + 3]
+        position += 2 + segment_length
+    return False
+
+def save_frame(filepath, frame, raw_jpeg=False):
+    """
+    Saves frame to filepath. If raw_jpeg is True, frame holds encoded JPEG bytes
+    and is written as is.
+    """
+    if raw_jpeg:
+        with open(filepath, "wb") as image_file:
+            image_file.write(frame.tobytes())
+    else:
+        cv2.imwrite(filepath, frame)
+
 def capture_camera_videos(duration=5, fps=30, output_dir="out/captured_videos",
                           filetype="avi", *feed_indices):
     """
@@ -122,8 +280,8 @@ def capture_camera_videos(duration=5, fps=30, output_dir="out/captured_videos",
         writer = None
         writer_list.append(writer)
 
-    start_time = time.time()
-    while time.time() < start_time + duration:
+    end_time = time.monotonic() + duration
+    while time.monotonic() < end_time:
         for camera_feed in camera_feed_list:
             frame = camera_feed.get_next(True, False)
             writer = writer_list[camera_feed_list.index(camera_feed)]
@@ -170,6 +328,10 @@ def parse_args():
                         type=int,
                         dest="camera_index",
                         help="Index of camera.")
+    parser.add_argument("--encoder", action="store", default="libx264",
+                        type=str,
+                        dest="encoder",
+                        help="ffmpeg video encoder, e.g. h264_nvenc.")
     return parser.parse_args()
 
 if __name__ == "__main__":
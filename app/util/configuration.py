@@ -7,6 +7,12 @@ from __future__ import absolute_import, division, print_function
 import os.path
 import yaml
 
+# Uses the libyaml C bindings when PyYAML was built with them.
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 from .textformatter import TextFormatter
 
 class Configuration(object):
@@ -33,7 +39,7 @@ class Configuration(object):
 
         # Opens up configuration profile and gets configuration, then cleans up.
         with open(self.config_profile, 'r') as config_profile:
-            configuration = yaml.load(config_profile)
+            configuration = yaml.load(config_profile, Loader=SafeLoader)
         TextFormatter.print_info("You have imported the %s configuration." % configuration['name'])
         return configuration
 
@@ -43,6 +49,7 @@ class Configuration(object):
         """
         TextFormatter.print_heading("Current Configuration")
         with open(self.config_profile, 'r') as config_profile:
-            configuration = yaml.load(config_profile)
-        for key in sorted(configuration.keys()):
-            TextFormatter.print_pair(key, configuration[key])
+            configuration = yaml.load(config_profile, Loader=SafeLoader)
+        # Loaded dicts keep the profile's key order, which groups related settings.
+        for key, val in configuration.items():
+            TextFormatter.print_pair(key, val)
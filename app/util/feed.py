@@ -4,17 +4,46 @@ Module for defining wrappers to OpenCV incoming feeds.
 from __future__ import absolute_import, division, print_function
 from abc import ABCMeta, abstractmethod
 import sys
-import imutils
+import threading
+import queue
 import cv2
-from app.stitcher.correction.corrector import correct_distortion
+from app.stitcher.correction.corrector import get_correction_maps
 from .textformatter import TextFormatter
 
+# Module-level references for calls made on every frame, avoiding repeated attribute lookups.
+_resize = cv2.resize
+_remap = cv2.remap
+
+MJPG_FOURCC = cv2.VideoWriter_fourcc(*"MJPG")
+
+# Validity messages are colored once here; only the feed name is filled in per check.
+_VALID_VIDEO_MSG = "Video file {0} is valid {1}\n".format(
+    TextFormatter.color_text("{0}", "magenta"), TextFormatter.get_check())
+_INVALID_VIDEO_MSG = "Video file {0} is invalid {1}\n".format(
+    TextFormatter.color_text("{0}", "magenta"), TextFormatter.get_xmark())
+
 class Feed(object):
     """
     Abstract feed class for representing a feed.
     """
     __metaclass__ = ABCMeta
 
+    def __init__(self, width, height):
+        """
+        Initializes the frame size and the processing state shared by all feeds.
+        """
+        self.width = width
+        self.height = height
+        self._src_size = None
+        self._dsize = None
+        self._interpolation = None
+        self._fuse_correction = False
+        self._correction_maps = None
+        self._source_correction_maps = None
+        self._raw = None
+        self._corrected = None
+        self._resized = None
+
     @abstractmethod
     def has_next(self):
         """
@@ -23,7 +52,7 @@ class Feed(object):
         pass
 
     @abstractmethod
-    def get_next(self):
+    def get_next(self, resize=True, correct=True):
         """
         Returns the next frame from feed.
         """
@@ -50,17 +79,97 @@ class Feed(object):
         """
         pass
 
-class CameraFeed(Feed):
+    def resize(self, frame):
+        """
+        Resizes frame to the width of the feed, keeping its aspect ratio.
+        The output size and interpolation are computed once from the first frame.
+        The returned frame is overwritten by the next call; copy it to keep it.
+        """
+        if self._dsize is None:
+            self._init_dsize(frame)
+        # The frame already has the requested width, so there is nothing to resize.
+        if self._interpolation is None:
+            return frame
+        self._resized = _resize(frame, self._dsize, dst=self._resized,
+                                interpolation=self._interpolation)
+        return self._resized
+
+    def correct_and_resize(self, frame):
+        """
+        Corrects distortion and resizes frame in a single remap pass over the output pixels.
+        Remapping samples bilinearly without area filtering, so frames shrunk to less than
+        half their width are corrected at full size and then resized with INTER_AREA instead.
+        The remap tables are computed once from the first frame.
+        The returned frame is overwritten by the next call; copy it to keep it.
+        """
+        if self._dsize is None:
+            self._init_dsize(frame)
+        if not self._fuse_correction:
+            return self.resize(self.correct(frame))
+        if self._correction_maps is None:
+            self._correction_maps = get_correction_maps(self._src_size, self._dsize)
+        (map1, map2) = self._correction_maps
+        self._resized = _remap(frame, map1, map2, cv2.INTER_LINEAR, dst=self._resized)
+        return self._resized
+
+    def correct(self, frame):
+        """
+        Corrects distortion of frame, keeping its size.
+        The remap tables are computed once from the first frame.
+        The returned frame is overwritten by the next call; copy it to keep it.
+        """
+        if self._source_correction_maps is None:
+            if self._src_size is None:
+                self._init_dsize(frame)
+            self._source_correction_maps = get_correction_maps(self._src_size)
+        (map1, map2) = self._source_correction_maps
+        self._corrected = _remap(frame, map1, map2, cv2.INTER_LINEAR, dst=self._corrected)
+        return self._corrected
+
+    def _init_dsize(self, frame):
+        """
+        Computes the output size and resize interpolation from the shape of frame.
+        """
+        (height, width) = frame.shape[:2]
+        self._src_size = (width, height)
+        # Integer arithmetic rounds the scaled height to nearest without float conversion.
+        self._dsize = (self.width, (height * self.width + width // 2) // width)
+        # Fusing correction with resizing only avoids aliasing down to half the source width.
+        self._fuse_correction = 2 * self.width >= width
+        if self.width < width:
+            self._interpolation = cv2.INTER_AREA
+        elif self.width > width:
+            self._interpolation = cv2.INTER_LINEAR
+
+class CameraFeed(Feed): # pylint: disable=too-many-instance-attributes
     """
     Wrapper class for incoming camera feed.
     """
     def __init__(self, feed_index, width=640, height=480, fps=30):
+        super(CameraFeed, self).__init__(width, height)
         self.feed_index = feed_index
-        self.camera_feed = cv2.VideoCapture(feed_index)
-        self.width = width
-        self.height = height
         self.fps = fps
         self.frame_duration = 1.0 / fps
+        self._frames = queue.Queue(maxsize=1)
+        self._stop_event = threading.Event()
+        self._reader_thread = None
+        self._pending = None
+        self._exhausted = False
+        self.camera_feed = self.open_capture()
+        self._read = self.camera_feed.read
+
+    def open_capture(self):
+        """
+        Opens the capture device for the feed index. MJPG is requested as the capture format,
+        the driver buffer is limited to a single frame so reads return the freshest frame, and
+        the fps is requested up front. The capture size is left at the sensor default, since the
+        distortion calibration in the corrector is only valid for that sensor mode.
+        """
+        camera_feed = cv2.VideoCapture(self.feed_index)
+        camera_feed.set(cv2.CAP_PROP_FOURCC, MJPG_FOURCC)
+        camera_feed.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        camera_feed.set(cv2.CAP_PROP_FPS, self.fps)
+        return camera_feed
 
     def is_valid(self):
         """
@@ -70,7 +179,10 @@ class CameraFeed(Feed):
 
         What is coming: checking if the frame is all black or close to all black.
         If it isn't, return true (in addition to the current feed validity test)
+
+        A running reader thread is stopped for the check and restarted on the reopened device.
         """
+        restart_reader = self._stop_reader()
         frame_indicator = self.camera_feed.grab()
 
         # If a frame is read, print message and return True.
@@ -80,7 +192,10 @@ class CameraFeed(Feed):
                 TextFormatter.get_check())
             print(msg)
             self.close()
-            self.camera_feed = cv2.VideoCapture(self.feed_index)
+            self.camera_feed = self.open_capture()
+            self._read = self.camera_feed.read
+            if restart_reader:
+                self.start()
             return True
         else:
             msg = "Index {0} is invalid {1}".format(
@@ -92,7 +207,14 @@ class CameraFeed(Feed):
     def has_next(self):
         """
         Declares if the CameraFeed has a next frame.
-        """
+        While the reader thread runs, waits for its next frame and holds it for get_next(),
+        like grab() does for a synchronous feed. Returns False once the reader has stopped.
+        """
+        if self._reader_thread is not None:
+            if self._pending is None and not self._exhausted:
+                self._pending = self._frames.get()
+                self._exhausted = self._pending is None
+            return not self._exhausted
         return self.camera_feed.grab()
 
     def retrieve_next(self):
@@ -103,24 +225,91 @@ class CameraFeed(Feed):
         return self.camera_feed.retrieve()
 
 
-    def get_next(self):
+    def enable_raw_jpeg(self):
+        """
+        Makes retrieve_next() return the undecoded MJPG bytes delivered by the camera, so a
+        frame can be saved without a decode and re-encode round trip. Returns True if the
+        camera delivers MJPG and the capture backend supports raw retrieval.
+        """
+        if int(self.camera_feed.get(cv2.CAP_PROP_FOURCC)) != MJPG_FOURCC:
+            return False
+        return self.camera_feed.set(cv2.CAP_PROP_FORMAT, -1)
+
+    def get_next(self, resize=True, correct=True):
         """
         Gets the next frame in the CameraFeed. If resize is True, resizes frame.
         If correct is True, corrects distortion.
-        """
-        frame = self.camera_feed.read()[1]
-        frame = correct_distortion(frame)
-        frame = imutils.resize(frame, width=self.width)
+        Frame buffers are reused, so the returned frame is overwritten by the next call.
+        """
+        if self._reader_thread is not None:
+            if self._pending is not None:
+                (frame, self._pending) = (self._pending, None)
+            elif self._exhausted:
+                return None
+            else:
+                frame = self._frames.get()
+                if frame is None:
+                    # The reader has stopped; the sentinel is not put back.
+                    self._exhausted = True
+                    return None
+        else:
+            # Reads into the buffer of the previous frame instead of allocating a new one.
+            self._raw = self._read(self._raw)[1]
+            frame = self._raw
+        if correct and resize:
+            frame = self.correct_and_resize(frame)
+        elif correct:
+            frame = self.correct(frame)
+        elif resize:
+            frame = self.resize(frame)
         return frame
 
+    def start(self):
+        """
+        Starts a daemon thread that continuously reads frames from the camera so capture is
+        decoupled from processing. Only the most recent frame is kept, so get_next() always
+        returns a fresh frame. Returns the CameraFeed for chaining.
+        """
+        if self._reader_thread is None:
+            # A fresh queue drops the end-of-frames sentinel left by a previous reader.
+            self._frames = queue.Queue(maxsize=1)
+            self._pending = None
+            self._exhausted = False
+            self._stop_event.clear()
+            self._reader_thread = threading.Thread(target=self._read_frames)
+            self._reader_thread.daemon = True
+            self._reader_thread.start()
+        return self
+
+    def _read_frames(self):
+        """
+        Reader loop run by the thread launched in start().
+        Replaces any unconsumed frame with the newly read one.
+        """
+        while not self._stop_event.is_set():
+            grabbed, frame = self._read()
+            if not grabbed:
+                break
+            self._replace_frame(frame)
+        self._stop_event.set()
+        self._replace_frame(None)
+
+    def _replace_frame(self, frame):
+        """
+        Drops the stale frame in the size-1 queue, if any, and puts the provided one.
+        """
+        try:
+            self._frames.get_nowait()
+        except queue.Empty:
+            pass
+        self._frames.put_nowait(frame)
+
     def ramp(self, num_frames=30):
         """ Ramps the camera feed to prepare for capture and data relay. """
-        try:
-            for _ in xrange(num_frames):
-                self.get_next()
-        except NameError:
-            for _ in range(num_frames):
-                self.get_next()
+        # Frames grabbed while ramping are discarded, so they are never decoded.
+        grab = self.camera_feed.grab
+        for _ in range(num_frames):
+            grab()
 
     def show(self):
         """
@@ -143,18 +332,30 @@ class CameraFeed(Feed):
         """
         Closes the CameraFeed.
         """
+        self._stop_reader()
         self.camera_feed.release()
 
+    def _stop_reader(self):
+        """
+        Stops and joins the reader thread launched in start().
+        Returns True if a reader was running.
+        """
+        if self._reader_thread is None:
+            return False
+        self._stop_event.set()
+        self._reader_thread.join()
+        self._reader_thread = None
+        return True
+
     def show_corrected(self):
         raise Exception('Not implemented!')
 
 class VideoFeed(Feed):
     """ Wrapper class for video feed. """
     def __init__(self, path, width=640, height=480):
+        super(VideoFeed, self).__init__(width, height)
         self.path = path
         self.video_feed = cv2.VideoCapture(path)
-        self.width = width
-        self.height = height
 
     def is_valid(self):
         """
@@ -164,20 +365,12 @@ class VideoFeed(Feed):
         frame_indicator = self.video_feed.grab()
 
         if frame_indicator:
-            msg = "Video file {0} is valid {1}".format(
-                TextFormatter.color_text(str(self.path), "magenta"),
-                TextFormatter.get_check())
-            # print(msg)
-            sys.stderr.write(msg)
+            sys.stderr.write(_VALID_VIDEO_MSG.format(self.path))
             self.close()
             self.video_feed = cv2.VideoCapture(self.path)
             return True
         else:
-            msg = "Video file {0} is invalid {1}".format(
-                TextFormatter.color_text(str(self.path), "magenta"),
-                TextFormatter.get_xmark())
-            # print(msg)
-            sys.stderr.write(msg)
+            sys.stderr.write(_INVALID_VIDEO_MSG.format(self.path))
             return False
 
     def has_next(self):
@@ -186,14 +379,21 @@ class VideoFeed(Feed):
         """
         return self.video_feed.grab()
 
-    def get_next(self):
+    def get_next(self, resize=True, correct=True):
         """
         Gets the next frame in the CameraFeed. If resize is True, resizes frame.
         If correct is True, corrects distortion.
-        """
-        frame = self.video_feed.read()[1]
-        frame = correct_distortion(frame)
-        frame = imutils.resize(frame, width=self.width)
+        Frame buffers are reused, so the returned frame is overwritten by the next call.
+        """
+        # Reads into the buffer of the previous frame instead of allocating a new one.
+        self._raw = self.video_feed.read(self._raw)[1]
+        frame = self._raw
+        if correct and resize:
+            frame = self.correct_and_resize(frame)
+        elif correct:
+            frame = self.correct(frame)
+        elif resize:
+            frame = self.resize(frame)
         return frame
 
     def show(self):
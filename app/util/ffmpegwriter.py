@@ -0,0 +1,48 @@
+"""
+Module for writing frames to a video file through an ffmpeg subprocess.
+"""
+from __future__ import absolute_import, division, print_function
+import subprocess
+
+# Fastest encoding preset for each supported encoder.
+ENCODER_PRESETS = {
+    "libx264": "ultrafast",
+    "h264_nvenc": "p1",
+    "h264_qsv": "veryfast",
+}
+
+class FFmpegWriter(object):
+    """
+    Video writer that pipes raw BGR frames into ffmpeg, so encoding runs outside the Python
+    process and can use a hardware encoder such as h264_nvenc, h264_qsv or h264_vaapi.
+    Mirrors the write/release interface of cv2.VideoWriter.
+    """
+    def __init__(self, filepath, fps, frame_size, encoder="libx264"):
+        (width, height) = frame_size
+        command = [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+            '-s', '{0}x{1}'.format(width, height), '-r', str(fps),
+            '-i', 'pipe:0', '-an', '-c:v', encoder]
+        if encoder in ENCODER_PRESETS:
+            command.extend(['-preset', ENCODER_PRESETS[encoder]])
+        command.extend(['-pix_fmt', 'yuv420p', filepath])
+        # The process outlives the constructor and is closed by release().
+        self.proc = subprocess.Popen(command, stdin=subprocess.PIPE) # pylint: disable=consider-using-with
+
+    def write(self, frame):
+        """
+        Writes a frame to the ffmpeg process.
+        """
+        self.proc.stdin.write(frame.tobytes())
+
+    def release(self):
+        """
+        Closes the pipe and waits for ffmpeg to finish writing the file.
+        """
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            # ffmpeg already exited, e.g. because the encoder is unavailable.
+            pass
+        self.proc.wait()
@@ -114,14 +114,14 @@ class TextFormatter(object):
         """
         Returns check-mark symbol.
         """
-        return colored(CHECK.encode('utf-8'), "green", attrs=['bold'])
+        return colored(CHECK, "green", attrs=['bold'])
 
     @staticmethod
     def get_xmark():
         """
         Returns x-mark symbol.
         """
-        return colored(X_MARK.encode('utf-8'), "red", attrs=['bold'])
+        return colored(X_MARK, "red", attrs=['bold'])
 
     @staticmethod
     def get_input_msg(msg):
@@ -9,3 +9,20 @@ def pytest_addoption(parser):
     Controls running of opencv-required tests.
     """
     parser.addoption("--opencv", action="store_true", help="Run opencv-required tests.")
+
+def pytest_configure(config):
+    """
+    Registers the marker for opencv-required tests.
+    """
+    config.addinivalue_line("markers", "opencv: test requires opencv and a camera.")
+
+def pytest_collection_modifyitems(config, items):
+    """
+    Skips opencv-required tests unless the --opencv option is provided.
+    """
+    if config.getoption("--opencv"):
+        return
+    skip_opencv = pytest.mark.skip(reason="Need --opencv option to run.")
+    for item in items:
+        if item.get_closest_marker("opencv") is not None:
+            item.add_marker(skip_opencv)